@@ -1,6 +1,35 @@
+import collections
+import functools
 import itertools
 import random
 
+# Sentence._status values
+UNKNOWN = 0
+ALL_MINES = 1
+ALL_SAFE = 2
+
+
+@functools.lru_cache(maxsize=None)
+def _neighbor_masks(height, width):
+    """
+    Returns a tuple holding, for every cell index row * width + col,
+    the bitmask of all cells within one row and column of that cell,
+    not including the cell itself.
+    """
+    masks = []
+    for i in range(height):
+        for j in range(width):
+            mask = 0
+            for row, col in itertools.product(
+                    range(max(0, i - 1), min(height, i + 2)),
+                    range(max(0, j - 1), min(width, j + 2))):
+                mask |= 1 << (row * width + col)
+
+            # Remove the cell itself
+            masks.append(mask & ~(1 << (i * width + j)))
+
+    return tuple(masks)
+
 
 class Minesweeper():
     """
@@ -15,20 +44,24 @@ class Minesweeper():
         self.mines = set()
 
         # Initialize an empty field with no mines
-        self.board = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(False)
-            self.board.append(row)
+        self.board = [[False] * width for _ in range(height)]
+
+        # Add mines randomly, sampling distinct cells without retries
+        for idx in random.sample(range(height * width), mines):
+            i, j = divmod(idx, width)
+            self.mines.add((i, j))
+            self.board[i][j] = True
+
+        # Count the mines around every cell once, since the board never changes
+        self._counts = [[0] * width for _ in range(height)]
+        for i, j in self.mines:
+            for row, col in itertools.product(
+                    range(max(0, i - 1), min(height, i + 2)),
+                    range(max(0, j - 1), min(width, j + 2))):
+                self._counts[row][col] += 1
 
-        # Add mines randomly
-        while len(self.mines) != mines:
-            i = random.randrange(height)
-            j = random.randrange(width)
-            if not self.board[i][j]:
-                self.mines.add((i, j))
-                self.board[i][j] = True
+            # The mine itself was counted as its own neighbor
+            self._counts[i][j] -= 1
 
         # At first, player has found no mines
         self.mines_found = set()
@@ -58,24 +91,8 @@ class Minesweeper():
         within one row and column of a given cell,
         not including the cell itself.
         """
-
-        # Keep count of nearby mines
-        count = 0
-
-        # Loop over all cells within one row and column
-        for i in range(cell[0] - 1, cell[0] + 2):
-            for j in range(cell[1] - 1, cell[1] + 2):
-
-                # Ignore the cell itself
-                if (i, j) == cell:
-                    continue
-
-                # Update count if cell in bounds and is mine
-                if 0 <= i < self.height and 0 <= j < self.width:
-                    if self.board[i][j]:
-                        count += 1
-
-        return count
+        i, j = cell
+        return self._counts[i][j]
 
     def won(self):
         """
@@ -89,54 +106,79 @@ class Sentence():
     Logical statement about a Minesweeper game
     A sentence consists of a set of board cells,
     and a count of the number of those cells which are mines.
+
+    The set of cells is stored as an int bitmask, with the cell
+    (row, col) at bit row * width + col. known_mines and known_safes
+    return bitmasks, and cells are marked with bitmasks as well.
     """
 
     def __init__(self, cells, count):
-        self.cells = set(cells)
+        if not isinstance(cells, int):
+            raise TypeError(
+                f"cells must be an int bitmask, not {type(cells).__name__}"
+            )
+
+        self.cells = cells
         self.count = count
+        self._refresh()
 
     def __eq__(self, other):
-        return self.cells == other.cells and self.count == other.count
+        return self.count == other.count and self.cells == other.cells
+
+    def __hash__(self):
+        return hash((self.cells, self.count))
 
     def __str__(self):
-        return f"{self.cells} = {self.count}"
+        return f"{self.cells:b} = {self.count}"
+
+    def _refresh(self):
+        """
+        Recomputes whether all cells are known to be mines or safe.
+        """
+        if self.count == 0:
+            self._status = ALL_SAFE
+        elif self.cells.bit_count() == self.count:
+            self._status = ALL_MINES
+        else:
+            self._status = UNKNOWN
 
     def known_mines(self):
         """
-        Returns the set of all cells in self.cells known to be mines.
+        Returns the bitmask of all cells in self.cells known to be mines.
         """
-        if len(self.cells) == self.count:
+        if self._status == ALL_MINES:
             return self.cells
 
-        return set()
+        return 0
 
     def known_safes(self):
         """
-        Returns the set of all cells in self.cells known to be safe.
+        Returns the bitmask of all cells in self.cells known to be safe.
         """
-        if (self.count == 0):
+        if self._status == ALL_SAFE:
             return self.cells
 
-        return set()
+        return 0
 
-    def mark_mine(self, cell):
+    def mark_mines_bulk(self, mask):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be a mine.
+        all cells in mask are known to be mines.
         """
-        # Remove from self.cells
-        if cell in self.cells:
-            self.cells.remove(cell)
-            self.count -= 1
+        overlap = self.cells & mask
+        if overlap:
+            self.cells ^= overlap
+            self.count -= overlap.bit_count()
+            self._refresh()
 
-    def mark_safe(self, cell):
+    def mark_safes_bulk(self, mask):
         """
         Updates internal knowledge representation given the fact that
-        a cell is known to be safe.
+        all cells in mask are known to be safe.
         """
-        # Remove from self.cells
-        if cell in self.cells:
-            self.cells.remove(cell)
+        if self.cells & mask:
+            self.cells &= ~mask
+            self._refresh()
 
 
 class MinesweeperAI():
@@ -160,57 +202,199 @@ class MinesweeperAI():
         # List of sentences about the game known to be true
         self.knowledge = []
 
+        # (cells, count) keys of the sentences in self.knowledge
+        self._kb_keys = set()
+
+        # Sentences in self.knowledge indexed by the cells they contain
+        self._by_cell = [[] for _ in range(height * width)]
+
+        # Sentences added or changed since inferences were last drawn
+        self._dirty = collections.deque()
+
+        # Bitmask mirrors of moves_made, mines and safes,
+        # one bit per cell at index row * width + col
+        self._moves_m = 0
+        self._mines_m = 0
+        self._safes_m = 0
+        self._full = (1 << (height * width)) - 1
+
+        # Neighbor bitmask of every cell, shared by boards of the same size
+        self._nbr = _neighbor_masks(height, width)
+
+    def _index(self, cell):
+        """
+        Returns the bit index of a cell.
+        """
+        return cell[0] * self.width + cell[1]
+
+    def _cell(self, idx):
+        """
+        Returns the cell at a given bit index.
+        """
+        return divmod(idx, self.width)
+
+    def _bits(self, mask):
+        """
+        Yields the index of every bit set in mask.
+        """
+        while mask:
+            low = mask & -mask
+            yield low.bit_length() - 1
+            mask ^= low
+
+    def _cells(self, mask):
+        """
+        Returns the set of cells whose bits are set in mask.
+        """
+        return {self._cell(idx) for idx in self._bits(mask)}
+
+    def _index_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base and its indexes unless an
+        equal sentence is already known. Returns whether it was added.
+        """
+        key = (sentence.cells, sentence.count)
+        if key in self._kb_keys:
+            return False
+
+        self._kb_keys.add(key)
+        self.knowledge.append(sentence)
+        for idx in self._bits(sentence.cells):
+            self._by_cell[idx].append(sentence)
+
+        return True
+
+    def _add_sentence(self, sentence):
+        """
+        Adds a new sentence to the knowledge base and queues it
+        for inference. Returns whether it was added.
+        """
+        if not self._index_sentence(sentence):
+            return False
+
+        self._dirty.append(sentence)
+        return True
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
         to mark that cell as a mine as well.
         """
-        self.mines.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_mine(cell)
+        self._flush_marks(1 << self._index(cell), 0)
 
     def mark_safe(self, cell):
         """
         Marks a cell as safe, and updates all knowledge
         to mark that cell as safe as well.
         """
-        self.safes.add(cell)
-        for sentence in self.knowledge:
-            sentence.mark_safe(cell)
+        self._flush_marks(0, 1 << self._index(cell))
 
-    def mark_additional_cells(self):
+    def _flush_marks(self, mines, safes):
         """
-        Marks additional cells as safe or as mines if it can be
-        concluded based on the AI's knowledge base.
+        Marks every cell in the mines bitmask as a mine and every cell
+        in the safes bitmask as safe, updating only the sentences that
+        contain them. Returns whether any new cell was marked.
         """
-        mines = []
-        safes = []
-        for sentence in self.knowledge:
-            # mark any additional cells as mines if it can be concluded based on the AI's knowledge base
-            if sentence.known_mines():
-                for cell in sentence.known_mines():
-                    if cell in self.mines:
-                        continue
+        mines &= ~self._mines_m
+        safes &= ~self._safes_m
+        if not (mines or safes):
+            return False
+
+        self.mines.update(self._cells(mines))
+        self.safes.update(self._cells(safes))
+        self._mines_m |= mines
+        self._safes_m |= safes
+
+        # Only the sentences listed under a marked cell change,
+        # and afterwards no sentence contains a marked cell
+        changed = {}
+        for idx in self._bits(mines | safes):
+            for sentence in self._by_cell[idx]:
+                changed[id(sentence)] = sentence
+            self._by_cell[idx].clear()
+
+        for sentence in changed.values():
+            self._kb_keys.discard((sentence.cells, sentence.count))
+            sentence.mark_mines_bulk(mines)
+            sentence.mark_safes_bulk(safes)
+
+        # Drop changed sentences that became empty or duplicates,
+        # and queue the others so their consequences are drawn
+        dropped = set()
+        for sentence in changed.values():
+            key = (sentence.cells, sentence.count)
+            if sentence.cells and key not in self._kb_keys:
+                self._kb_keys.add(key)
+                self._dirty.append(sentence)
+                continue
 
-                    mines.append(cell)
+            dropped.add(id(sentence))
+            for idx in self._bits(sentence.cells):
+                sentences = self._by_cell[idx]
+                sentences[:] = [other for other in sentences if other is not sentence]
 
-                continue
+            # Empty the sentence so that, if it is still queued in
+            # self._dirty, _infer skips it instead of inferring from
+            # cells that are already known
+            sentence.cells = 0
 
-            # mark any additional cells as safe if it can be concluded based on the AI's knowledge base
-            if sentence.known_safes():
-                for cell in sentence.known_safes():
-                    if cell in self.safes:
-                        continue
+        if dropped:
+            self.knowledge = [
+                sentence for sentence in self.knowledge
+                if id(sentence) not in dropped
+            ]
+
+        return True
 
-                    safes.append(cell)
+    def _infer(self):
+        """
+        Draws every conclusion that follows from the queued sentences.
+        Each queued sentence either marks its cells, if they are all
+        known to be mines or safe, or is compared with the sentences it
+        shares cells with to infer new sentences, which are queued in turn.
+        """
+        dirty = self._dirty
+        by_cell = self._by_cell
+        kb_keys = self._kb_keys
+        add_sentence = self._add_sentence
+        while dirty:
+            sentence = dirty.popleft()
+            cells = sentence.cells
+            if not cells:
+                continue
 
+            # Mark known safes and mines in all sentences at once
+            mines = sentence.known_mines()
+            safes = sentence.known_safes()
+            if mines or safes:
+                self._flush_marks(mines, safes)
                 continue
 
-        for mine in mines:
-            self.mark_mine(mine)
+            # Every superset of the sentence contains each of its cells,
+            # so only the sentences listed under its lowest cell are checked
+            count = sentence.count
+            for other in by_cell[(cells & -cells).bit_length() - 1]:
+                superset = other.cells
+                if superset & cells != cells or superset == cells:
+                    continue
+
+                key = (superset ^ cells, other.count - count)
+                if key not in kb_keys:
+                    add_sentence(Sentence(*key))
 
-        for safe in safes:
-            self.mark_safe(safe)
+            # Every subset of the sentence is listed under one of its cells,
+            # and is checked only under its own lowest cell
+            for idx in self._bits(cells):
+                for other in by_cell[idx]:
+                    subset = other.cells
+                    if (subset & -subset).bit_length() - 1 != idx:
+                        continue
+                    if subset & cells != subset or subset == cells:
+                        continue
+
+                    key = (cells ^ subset, count - other.count)
+                    if key not in kb_keys:
+                        add_sentence(Sentence(*key))
 
     def add_knowledge(self, cell, count):
         """
@@ -227,103 +411,29 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        idx = self._index(cell)
         self.moves_made.add(cell)
+        self._moves_m |= 1 << idx
         self.mark_safe(cell)
 
         # Add a new sentence to the knowledge base
-        neighbors = set()
-        for row in range(cell[0] - 1, cell[0] + 2):
-            for col in range(cell[1] - 1, cell[1] + 2):
-                neighbor = (row, col)
-
-                # Decrement count to reflect that one of the neighboring cells is a mine
-                if neighbor in self.mines:
-                    count -= 1
-                    continue
-
-                if (
-                        neighbor in self.safes or
-                        neighbor == cell or
-                        row >= self.height or
-                        row < 0 or
-                        col < 0 or
-                        col >= self.width):
-                    continue
+        nbr = self._nbr[idx]
 
-                neighbors.add(neighbor)
+        # Decrement count to reflect the neighboring cells known to be mines
+        count -= (nbr & self._mines_m).bit_count()
+        neighbors = nbr & ~(self._safes_m | self._mines_m)
 
         # Only add a new sentence if there are unexplored neighbors
-        if (len(neighbors) > 0):
+        if neighbors:
             sentence = Sentence(
                 cells=neighbors,
                 count=count
             )
 
-            self.knowledge.append(sentence)
-
-        self.mark_additional_cells()
-
-        newInferences = True
-
-        # Create new inferences
-        while newInferences:
-            newInferences = False
-            knownSafes = set()
-            knownMines = set()
-
-            # Check for known safes an mines
-            for sentence in self.knowledge:
-                if sentence.known_safes():
-                    knownSafes.update(sentence.known_safes())
-                if sentence.known_mines():
-                    knownMines.update(sentence.known_mines())
-
-            # If the cell is a known safe cell,
-            # mark it as safe in all sentences.
-            # This means that our knowledge base has been updated.
-            # Which means that we need to check for new sentences that we can infer
-            for cell in knownSafes:
-                if cell not in self.safes:
-                    self.mark_safe(cell)
-                    newInferences = True
-
-            # If the cell is a known mine cell,
-            # mark it as a mine in all sentences.
-            # This means that our knowledge base has been updated.
-            # Which means that we need to check for new sentences that we can infer
-            for cell in knownMines:
-                if cell not in self.mines:
-                    self.mark_mine(cell)
-                    newInferences = True
-
-            # Use subset algorithm to infer new sentences
-            newSentences = []
-            for sentence in self.knowledge.copy():
-                # infer new sentences
-                for potential_subset in self.knowledge.copy():
-                    if sentence == potential_subset:
-                        continue
-
-                    if potential_subset.cells.issubset(sentence.cells):
-                        new_count = sentence.count - potential_subset.count
-                        new_cells = sentence.cells - potential_subset.cells
-
-                        newSentence = Sentence(
-                            cells=new_cells,
-                            count=new_count
-                        )
+            self._add_sentence(sentence)
 
-                        if len(new_cells) > 0 and newSentence not in self.knowledge:
-                            newSentences.append(newSentence)
-                            newInferences = True
-
-            if len(newSentences) <= 0:
-                continue
-
-            for sentence in newSentences:
-                self.knowledge.append(sentence)
-
-        self.mark_additional_cells()
+        # Create new inferences from everything that changed
+        self._infer()
 
         return None
 
@@ -336,13 +446,11 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for cell in self.safes:
-            if cell in self.moves_made:
-                continue
-
-            return cell
+        unplayed = self._safes_m & ~self._moves_m
+        if not unplayed:
+            return None
 
-        return None
+        return self._cell((unplayed & -unplayed).bit_length() - 1)
 
     def make_random_move(self):
         """
@@ -351,21 +459,17 @@ class MinesweeperAI():
             1) have not already been chosen, and
             2) are not known to be mines
         """
-        possibleMoves = []
-        for row in range(self.height):
-            for col in range(self.width):
-                cell = (row, col)
-
-                if cell in self.moves_made or cell in self.mines:
-                    continue
-
-                possibleMoves.append(cell)
-
-        if len(possibleMoves) == 0:
+        candidates = ~(self._moves_m | self._mines_m) & self._full
+        if not candidates:
             return None
 
-        moveMade = random.choice(possibleMoves)
+        # Pick the k-th set bit by clearing the k lowest ones
+        for _ in range(random.randrange(candidates.bit_count())):
+            candidates &= candidates - 1
+        idx = (candidates & -candidates).bit_length() - 1
+        moveMade = self._cell(idx)
 
         self.moves_made.add(moveMade)
+        self._moves_m |= 1 << idx
 
-        return moveMade
\ No newline at end of file
+        return moveMade
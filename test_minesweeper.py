@@ -0,0 +1,62 @@
+import random
+import unittest
+
+from minesweeper import Minesweeper, MinesweeperAI
+
+
+class TestMinesweeperAI(unittest.TestCase):
+    """
+    Replays AI games and checks the knowledge base after every move.
+    """
+
+    BOARDS = [(8, 8, 10), (9, 9, 10), (16, 16, 40), (16, 30, 99)]
+
+    def assert_consistent(self, ai, game):
+        known = ai._mines_m | ai._safes_m
+
+        # Conclusions must match the board
+        self.assertLessEqual(ai.mines, game.mines)
+        self.assertFalse(ai.safes & game.mines)
+
+        # No sentence is empty or still holds a known cell
+        for sentence in ai.knowledge:
+            self.assertTrue(sentence.cells)
+            self.assertFalse(sentence.cells & known)
+
+        # The key index matches the knowledge base, with no duplicates
+        keys = [(s.cells, s.count) for s in ai.knowledge]
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(ai._kb_keys, set(keys))
+
+        # Each cell lists exactly the sentences that contain it
+        for idx, sentences in enumerate(ai._by_cell):
+            self.assertEqual(
+                sorted(map(id, sentences)),
+                sorted(id(s) for s in ai.knowledge if s.cells >> idx & 1)
+            )
+
+    def test_replay_keeps_knowledge_consistent(self):
+        for height, width, mines in self.BOARDS:
+            for seed in range(25):
+                with self.subTest(board=(height, width, mines), seed=seed):
+                    random.seed(seed)
+                    game = Minesweeper(height, width, mines)
+                    ai = MinesweeperAI(height, width)
+                    while True:
+                        move = ai.make_safe_move()
+                        safe = move is not None
+                        if not safe:
+                            move = ai.make_random_move()
+                        if move is None:
+                            break
+
+                        if game.is_mine(move):
+                            self.assertFalse(safe, f"safe move {move} is a mine")
+                            break
+
+                        ai.add_knowledge(move, game.nearby_mines(move))
+                        self.assert_consistent(ai, game)
+
+
+if __name__ == "__main__":
+    unittest.main()